@@ -110,6 +110,9 @@ EXPORT_FILE = {
     
     # In csv/{year}/ or json/{year}/
     'obs_merged'    : "obs_ebird_{start_date}--{end_date}",
+    
+    # In csv/, json/ or npz/ (species x period matrix)
+    'obs_matrix'    : "obs_matrix_{period}_{start_date}--{end_date}",
 }
 
 #-- Species table for import --------------------------------------------------|
@@ -18,6 +18,7 @@ import re
 import sys
 
 from modules.export_func import export
+from modules.import_func import read_species_table
 from constants import *
 
 # URL = "https://www.birdatlas.bc.ca/bcdata/codes.jsp?lang=en&pg=species&sortorder=codes"
@@ -73,10 +74,7 @@ def get_bc_codes(session: requests.Session, region_code: str) -> pd.DataFrame:
                 #--------------------------------------------------------------|
                 try:
                     # If ebird codes exists, read
-                    ebird_df = pd.read_csv(table_ebird, sep=',', header=0,
-                                           skipinitialspace=True,
-                                           quoting=csv.QUOTE_NONNUMERIC,
-                                           encoding='utf-8')
+                    ebird_df = read_species_table(table_ebird)
                     print(f"\nRead data from '{table_ebird}'.")
                     print(f"  {ebird_df.columns.to_list()}\n")
                     
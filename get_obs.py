@@ -14,14 +14,17 @@ Directory structure:
 │   ├── {YEAR}/
 │   │   ├── obs_count_{YYYY-MM-DD}--{YYYY-MM-DD}.csv
 │   │   └── ...
+│   ├── obs_matrix_{PERIOD}_{YYYY-MM-DD}--{YYYY-MM-DD}.csv (with --matrix)
 |   └── ...
+├── npz/
+│   └── obs_matrix_{PERIOD}_{YYYY-MM-DD}--{YYYY-MM-DD}.npz (with --matrix)
 └── species/
     ├── species_codes_bc.csv
     ├── species_ebird_{REGION}.csv
     └── species_merged_{REGION}.csv
 
 [Python] 3.8
-[Pkgs] requests, pandas
+[Pkgs] requests, pandas, numpy
 [References]
   eBird API 2.0: https://documenter.getpostman.com/view/664302/S1ENwy59
   API key request: https://ebird.org/api/keygen
@@ -37,11 +40,14 @@ import argparse
 from datetime import datetime, timedelta
 import requests
 import pandas as pd
-import csv
 import os
 import sys
 
 from modules.export_func import export
+from modules.import_func import read_species_table
+from modules.species_index import SpeciesIndex
+from modules.observations import iter_observations, aggregate, RequestError
+from modules.count_matrix import CountMatrix, PERIODS
 from get_species import get_species
 from get_bc_codes import get_bc_codes
 from constants import *
@@ -72,11 +78,14 @@ def main():
     parser.add_argument('-t', '--table', default=SPECIES_TABLE, help="Use the species table in this file (default: %(default)s)")
     parser.add_argument('-s', '--species', action='store_true', help="Download species table then exit (default: %(default)s)")
     parser.add_argument('-d', '--daily', action='store_true', help='Store daily data in JSON or CSV format (default: %(default)s)')
+    parser.add_argument('-m', '--matrix', metavar='PERIOD', choices=PERIODS,
+                        help='Build one species x period count matrix over the whole range instead of monthly tables: {%(choices)s} (default: %(default)s)')
     args = parser.parse_args()
     
     export_formats = set(args.formats)
     download_species = args.species
     download_daily = args.daily
+    matrix_period = args.matrix
     region_code = args.region
     api_key = args.api
     species_file = args.table
@@ -112,10 +121,8 @@ def main():
     if not download_species:
         try:
             # Read species codes (BC codes included)
-            species_df = pd.read_csv(species_file, sep=',', header=0,
-                                     skipinitialspace=True,
-                                     quoting=csv.QUOTE_NONNUMERIC,
-                                     encoding='utf-8')
+            # (From the binary snapshot if the CSV is unchanged)
+            species_df = read_species_table(species_file)
             print(f"Imported data from '{species_file}'.")
             print(f"  {species_df.columns.to_list()}")
             print(f"({species_df.shape[0]} species)\n")
@@ -151,77 +158,62 @@ def main():
     # Download obervation data
     #--------------------------------------------------------------------------|
     query_type = 'obs'
-    current_date = end_date
+    species_index = SpeciesIndex(species_df)
+    
+    def report_days(days):
+        last_date = None
+        for current_date, data in days:
+            if last_date is None or current_date.month != last_date.month:
+                print(f"\n== {current_date.strftime('%B, %Y')} ==")
+            last_date = current_date
+            #-- Export daily data ---------------------------------------------|
+            if data and download_daily:
+                df = pd.DataFrame(data)
+                year, month = current_date.year, current_date.month
+                for fmt in export_formats:
+                    export(data if fmt == 'json' else df, fmt,
+                           EXPORT_FILE[query_type].format(start_date=current_date.strftime(DATE_FORMAT)),
+                           subdir=os.path.join(fmt, region_code, str(year), str(month)))
+                print(f"    ({df.shape[0]} rows x {df.shape[1]} columns)")
+            yield current_date, data
+    
     print("Downloading obervation data...")
-    while current_date >= start_date:
-        merged_df = species_df
-        merged_df[COUNT_COL] = 0
-        last_date = current_date
-        print(f"\n== {last_date.strftime('%B, %Y')} ==")
-        # For each month
-        while current_date.month == last_date.month:
-            day, month, year = current_date.day, current_date.month, current_date.year
-            
-            url_full = URL_DICT[query_type].format(region_code=region_code,
-                                              y=year, m=month, d=day)
-            response = session.get(url_full, headers=headers)
-            if response.status_code == 200:
-                data = response.json()
-                if data:
-                    df = pd.DataFrame(data)
-                    #-- Export daily data -------------------------------------|
-                    if download_daily:
-                        for fmt in export_formats:
-                            export(data if fmt == 'json' else df, fmt,
-                                   EXPORT_FILE[query_type].format(start_date=current_date.strftime(DATE_FORMAT)),
-                                   subdir=os.path.join(fmt, region_code, str(year), str(month)))
-                        print(f"    ({df.shape[0]} rows x {df.shape[1]} columns)")
-                    #-- Merge columns -----------------------------------------|
-                    # 'howMany' -> 'howMany','howMany_day1', 'howMany_day2', ...
-                    cols = [CODE_EBIRD, COUNT_COL]
-                    for col in df.columns:
-                        if col in EXTRA_COLS:
-                            cols.append(col)
-                    merged_df = pd.merge(merged_df, df[cols],
-                                         on=CODE_EBIRD, how='left',
-                                         suffixes=['', f'_{day}'])
-                    #-- Append missing rows -----------------------------------|
-                    missing_mask = ~df[CODE_EBIRD].isin(merged_df[CODE_EBIRD])
-                    if missing_mask.any():
-                        new_rows = df.loc[missing_mask, OBS_COLS]
-                        merged_df = pd.concat([merged_df, new_rows], ignore_index=True)
-                        print("Appended: ", new_rows['speciesCode'].to_list())
-            else:
-                sys.exit(f"GET request failed.\nURL: {url_full}\nStatus code: {response.status_code}")
-            
-            current_date -= timedelta(days=1)
-            
-        #-- Replace non-numeric values with 0, then fill NaN with 0 -----------|
-        count_columns = [col for col in merged_df.columns if 'howMany' in col]
-        merged_df[count_columns] = merged_df[count_columns] \
-                                    .apply(pd.to_numeric, errors='coerce') \
-                                    .fillna(0).astype('int64')
-        #-- Sum the 'howMany_*' columns ---------------------------------------|
-        merged_df[EXPORT_COUNT_COL] = merged_df[count_columns].sum(axis=1)
-        
-        #-- Extra columns -----------------------------------------------------|
-        # Append all the non-null different values into one column
-        for extra_col in EXTRA_COLS:
-            extra_columns = [col for col in merged_df.columns if extra_col in col]
-            merged_df[extra_col] = merged_df[extra_columns].apply(lambda x: ' '.join(set(x.dropna())), axis=1)
-        
-        merged_df = merged_df[EXPORT_OBS_COLS].rename(columns=OBS_COLUMN_DICT)
-        
-        #-- Export monthly data -----------------------------------------------|
-        date0_str = last_date.replace(day=1).strftime(DATE_FORMAT) # First day of the month
-        date1_str = last_date.strftime(DATE_FORMAT)
-        print("\nMerged:")
-        print(f"  {merged_df.columns.to_list()}\n")
-        for fmt in export_formats:
-            export(merged_df, fmt,
-                   EXPORT_FILE['obs_merged'].format(start_date=date0_str, end_date=date1_str),
-                   subdir=os.path.join(fmt, region_code, str(last_date.year)))
-        print(f"    ({merged_df.shape[0]} rows x {merged_df.shape[1]} columns)")
+    days = iter_observations(region_code, start_date, end_date, api_key, session)
+    
+    #-- Species x period matrix -----------------------------------------------|
+    if matrix_period:
+        matrix = CountMatrix(species_index, start_date, end_date, matrix_period)
+        try:
+            matrix.update(report_days(days), on_appended=lambda codes: print("Appended: ", codes))
+        except RequestError as e:
+            sys.exit(str(e))
+        date0_str = start_date.strftime(DATE_FORMAT)
+        date1_str = end_date.strftime(DATE_FORMAT)
+        print("\nMatrix:")
+        print(f"  {matrix.counts.shape[0]} species x {matrix.counts.shape[1]} {matrix_period}s\n")
+        for fmt in export_formats | {'npz'}:
+            export(matrix.to_arrays() if fmt == 'npz' else matrix.to_frame(), fmt,
+                   EXPORT_FILE['obs_matrix'].format(period=matrix_period, start_date=date0_str, end_date=date1_str),
+                   subdir=os.path.join(fmt, region_code))
+        return
+    
+    # Unknown species are appended to the species index
+    months = aggregate(report_days(days), species_index,
+                       on_appended=lambda codes: print("Appended: ", codes))
+    try:
+        for first_date, last_date, merged_df in months:
+            #-- Export monthly data -------------------------------------------|
+            date0_str = first_date.strftime(DATE_FORMAT) # Earliest date fetched in the month
+            date1_str = last_date.strftime(DATE_FORMAT)
+            print("\nMerged:")
+            print(f"  {merged_df.columns.to_list()}\n")
+            for fmt in export_formats:
+                export(merged_df, fmt,
+                       EXPORT_FILE['obs_merged'].format(start_date=date0_str, end_date=date1_str),
+                       subdir=os.path.join(fmt, region_code, str(last_date.year)))
+            print(f"    ({merged_df.shape[0]} rows x {merged_df.shape[1]} columns)")
+    except RequestError as e:
+        sys.exit(str(e))
 
 ###############################################################################|
 if __name__ == '__main__':
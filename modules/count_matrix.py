@@ -0,0 +1,200 @@
+"""
+Species x period count matrix for long-range aggregation
+"""
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+from modules.species_index import SpeciesIndex
+from constants import *
+
+PERIODS = ('month', 'week')
+
+#==============================================================================|
+def period_start(date: datetime, period: str) -> datetime:
+    """
+    First day of the month, or Monday of the week, containing date.
+    """
+    date = datetime(date.year, date.month, date.day)
+    if period == 'month':
+        return date.replace(day=1)
+    elif period == 'week':
+        return date - timedelta(days=date.weekday())
+    raise ValueError(f"Unsupported period {period}. Choose from {PERIODS}.")
+
+#==============================================================================|
+class CountMatrix:
+    """
+    Dense matrix of counts, one row per species slot of the index and one column per period.
+    - Filled incrementally, one day at a time
+    - 'X' and any other non-numeric values are counted as 0, but still mark the species as present
+    """
+    def __init__(self, species_index: SpeciesIndex, start_date: datetime, end_date: datetime, period='month'):
+        if start_date > end_date:
+            start_date, end_date = end_date, start_date
+        self.species_index = species_index
+        self.period = period
+        self._start = period_start(start_date, period)
+        n_periods = self._column(end_date) + 1
+        self._counts = np.zeros((len(species_index), n_periods), dtype=np.int64)
+        self._present = np.zeros((len(species_index), n_periods), dtype=bool)
+        self._seen = np.zeros(len(species_index), dtype=bool) # Rows seen by this matrix
+
+    def _column(self, date: datetime) -> int:
+        if self.period == 'month':
+            return (date.year - self._start.year) * 12 + date.month - self._start.month
+        return (period_start(date, self.period) - self._start).days // 7
+
+    def _grow(self) -> int:
+        """
+        Grow the rows to cover the index, which may be shared and grown by other consumers.
+        Returns the number of rows in use.
+        """
+        n_rows = len(self.species_index)
+        n = n_rows - self._counts.shape[0]
+        if n > 0:
+            n = max(n, self._counts.shape[0] // 2)
+            self._counts = np.vstack([self._counts, np.zeros((n, self._counts.shape[1]), dtype=np.int64)])
+            self._present = np.vstack([self._present, np.zeros((n, self._present.shape[1]), dtype=bool)])
+            self._seen = np.concatenate([self._seen, np.zeros(n, dtype=bool)])
+        return n_rows
+
+    #-- Fill ------------------------------------------------------------------|
+    def add(self, date: datetime, data: list) -> list:
+        """
+        Add the observations of one day.
+        Returns the species not in the species table seen for the first time by this matrix.
+        """
+        if not data:
+            return []
+        col = self._column(date)
+        if not 0 <= col < self._counts.shape[1]:
+            raise ValueError(f"{date.strftime('%Y-%m-%d')} is out of range.")
+        df = pd.DataFrame(data)
+        slots = self.species_index.lookup(df)
+        self._grow()
+        if COUNT_COL in df.columns:
+            values = pd.to_numeric(df[COUNT_COL], errors='coerce').fillna(0).astype('int64').to_numpy()
+            np.add.at(self._counts[:, col], slots, values)
+        self._present[slots, col] = True
+        #-- Appended species --------------------------------------------------|
+        new_mask = (slots >= self.species_index.n_table_slots) & ~self._seen[slots]
+        self._seen[slots] = True
+        if not new_mask.any():
+            return []
+        return list(dict.fromkeys(df[CODE_EBIRD].to_numpy()[new_mask]))
+
+    def update(self, days, on_appended=None):
+        """
+        Add (date, records) pairs, e.g. from `iter_observations`.
+        """
+        for date, data in days:
+            appended = self.add(date, data)
+            if appended and on_appended:
+                on_appended(appended)
+        return self
+
+    #-- Access ----------------------------------------------------------------|
+    @property
+    def counts(self) -> np.ndarray:
+        return self._counts[:self._grow()]
+
+    @property
+    def present(self) -> np.ndarray:
+        return self._present[:self._grow()]
+
+    @property
+    def codes(self) -> list:
+        codes = self.species_index.codes()
+        self._grow() # Cover every code, even if the index grew after the last `add`
+        return codes
+
+    @property
+    def periods(self) -> list:
+        if self.period == 'month':
+            return [datetime(self._start.year + (self._start.month - 1 + i) // 12,
+                             (self._start.month - 1 + i) % 12 + 1, 1)
+                    for i in range(self._counts.shape[1])]
+        return [self._start + timedelta(weeks=i) for i in range(self._counts.shape[1])]
+
+    def columns(self, start_date: datetime = None, end_date: datetime = None) -> slice:
+        """
+        Column slice of the periods overlapping [start_date, end_date].
+        """
+        n_periods = self._counts.shape[1]
+        col0 = 0 if start_date is None else min(max(self._column(start_date), 0), n_periods)
+        col1 = n_periods if end_date is None else min(max(self._column(end_date) + 1, 0), n_periods)
+        return slice(col0, col1)
+
+    def rows(self, codes) -> list:
+        """
+        Row positions of the given species codes. Raises KeyError for unknown codes.
+        """
+        positions = {code: i for i, code in enumerate(self.codes)}
+        return [positions[code] for code in codes]
+
+    def select(self, codes=None, start_date: datetime = None, end_date: datetime = None, present=False) -> np.ndarray:
+        """
+        Sub-matrix of counts (or presence if `present`). A view unless codes are given.
+        """
+        matrix = self.present if present else self.counts
+        matrix = matrix[:, self.columns(start_date, end_date)]
+        return matrix if codes is None else matrix[self.rows(codes)]
+
+    #-- Summaries -------------------------------------------------------------|
+    def species_totals(self, start_date: datetime = None, end_date: datetime = None) -> np.ndarray:
+        return self.select(start_date=start_date, end_date=end_date).sum(axis=1)
+
+    def period_totals(self) -> np.ndarray:
+        return self.counts.sum(axis=0)
+
+    def periods_present(self, start_date: datetime = None, end_date: datetime = None) -> np.ndarray:
+        """
+        Number of periods in which each species was reported.
+        """
+        return self.select(start_date=start_date, end_date=end_date, present=True).sum(axis=1)
+
+    def species_present(self) -> np.ndarray:
+        """
+        Number of species reported in each period.
+        """
+        return self.present.sum(axis=0)
+
+    #-- Export ----------------------------------------------------------------|
+    def labels(self) -> list:
+        fmt = '%Y-%m' if self.period == 'month' else '%Y-%m-%d'
+        return [p.strftime(fmt) for p in self.periods]
+
+    def species(self) -> pd.DataFrame:
+        """
+        speciesCode, BC code and name of each row, from the first species-table row
+        sharing the speciesCode (or the observation data for appended species).
+        """
+        species_df = self.species_index.slot_frame([CODE_BC, CODE_EBIRD, NAME_BC])
+        self._grow()
+        return species_df
+
+    def to_frame(self, present=False) -> pd.DataFrame:
+        """
+        One row per species, one column per period.
+        """
+        species_df = self.species()
+        n_rows = species_df.shape[0]
+        df = pd.DataFrame((self._present[:n_rows].astype('int64') if present else self._counts[:n_rows]),
+                          columns=self.labels())
+        return pd.concat([species_df, df], axis=1)
+
+    def to_arrays(self) -> dict:
+        """
+        Counts, presence, species (codes, BC codes, names) and period labels, e.g. for `export(..., 'npz', ...)`.
+        """
+        species_df = self.species().fillna('')
+        n_rows = species_df.shape[0]
+        return {
+            'counts'  : self._counts[:n_rows],
+            'present' : self._present[:n_rows],
+            'codes'   : species_df[CODE_EBIRD].to_numpy(dtype=str),
+            'codes_bc': species_df[CODE_BC].to_numpy(dtype=str),
+            'names'   : species_df[NAME_BC].to_numpy(dtype=str),
+            'periods' : np.array(self.labels(), dtype=str),
+        }
@@ -1,6 +1,7 @@
 """
 Functions for exporting data
 """
+import numpy as np
 import pandas as pd
 import csv
 import json
@@ -10,7 +11,7 @@ import sys
 #==============================================================================|
 def export(data, suffix: str, filename: str, subdir=''):
     """
-    Export to CSV or JSON. Data can be str or DataFrame.
+    Export to CSV, JSON or NPZ. Data can be str or DataFrame (dict of arrays for NPZ).
     """
     fullpath = os.path.join(subdir, filename) + f".{suffix}"
     if subdir and not os.path.isdir(subdir):
@@ -24,6 +25,8 @@ def export(data, suffix: str, filename: str, subdir=''):
         export_to_json(data, fullpath)
     elif suffix == 'csv':
         export_to_csv(data, fullpath)
+    elif suffix == 'npz':
+        export_to_npz(data, fullpath)
     else:
         sys.exit(f"Unsupported file type {suffix}.")
     print(f"--> Exported to: {fullpath}")
@@ -44,4 +47,8 @@ def export_to_json(data, fullpath: str):
     elif isinstance(data, pd.DataFrame):
         data.to_json(fullpath, orient='records', indent=4)
     else:
-        sys.exit(f"Unsupported data type {type(data)}")
\ No newline at end of file
+        sys.exit(f"Unsupported data type {type(data)}")
+
+#==============================================================================|
+def export_to_npz(data: dict, fullpath: str):
+    np.savez_compressed(fullpath, **data)
@@ -0,0 +1,145 @@
+"""
+Functions for importing data
+"""
+import numpy as np
+import pandas as pd
+import csv
+import os
+import tempfile
+
+#-- Binary snapshots of the species tables --
+# Stored next to the source CSV, e.g. species/.snapshot/species_merged_CA-BC.{size}-{mtime}.npy
+# A compact cache that is faster to load than the CSV; the DataFrame itself is still
+# built in each process. Layout (two arrays in one .npy file):
+#   codes: int32 (columns x rows), index into the pool; len(pool) - ncols means NaN
+#   pool:  uint8, the column names then the unique strings, UTF-8 joined by NUL
+SNAPSHOT_DIR = '.snapshot'
+POOL_SEP = '\x00'
+
+#==============================================================================|
+def read_species_table(fullpath: str) -> pd.DataFrame:
+    """
+    Read a species table exported by `export`.
+    Use the binary snapshot if it is up to date, otherwise parse the CSV and rebuild it.
+    """
+    snapshot = load_species_snapshot(fullpath)
+    if snapshot is not None:
+        return snapshot_to_frame(*snapshot)
+
+    df = read_csv(fullpath)
+    try:
+        save_species_snapshot(df, fullpath)
+    except (OSError, ValueError, TypeError):
+        pass # Keep the CSV result if the snapshot cannot be written
+    return df
+
+#==============================================================================|
+def read_csv(fullpath: str) -> pd.DataFrame:
+    return pd.read_csv(fullpath, sep=',', header=0,
+                       skipinitialspace=True,
+                       quoting=csv.QUOTE_NONNUMERIC,
+                       encoding='utf-8')
+
+#==============================================================================|
+def snapshot_path(fullpath: str) -> str:
+    """
+    Path of the snapshot of a CSV, stamped with its size and modification time.
+    Raises FileNotFoundError if the CSV does not exist.
+    """
+    stat = os.stat(fullpath)
+    dirname, basename = os.path.split(fullpath)
+    stem = os.path.splitext(basename)[0]
+    return os.path.join(dirname, SNAPSHOT_DIR, f"{stem}.{stat.st_size}-{stat.st_mtime_ns}.npy")
+
+#==============================================================================|
+def load_species_snapshot(fullpath: str):
+    """
+    Memory-map the snapshot of a CSV read-only. Returns (codes, pool), or None if
+    there is no usable snapshot for the current version of the CSV.
+    Raises FileNotFoundError if the CSV does not exist.
+    """
+    path = snapshot_path(fullpath)
+    try:
+        with open(path, 'rb') as f:
+            codes = _memmap_next(f, path)
+            pool = _memmap_next(f, path)
+    except (OSError, ValueError):
+        return None # Missing, unreadable or broken snapshot: parse the CSV instead
+    return codes, pool
+
+def _memmap_next(f, path: str) -> np.memmap:
+    version = np.lib.format.read_magic(f)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+    elif version == (2, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+    else:
+        raise ValueError(f"Unsupported .npy version {version}.")
+    offset = f.tell()
+    size = int(np.prod(shape))
+    f.seek(offset + size * dtype.itemsize)
+    if size == 0:
+        return np.empty(shape, dtype=dtype) # Nothing to map (e.g. a table without rows)
+    return np.memmap(path, dtype=dtype, mode='r', shape=shape, offset=offset,
+                     order='F' if fortran_order else 'C')
+
+#==============================================================================|
+def save_species_snapshot(df: pd.DataFrame, fullpath: str):
+    """
+    Compile a table of strings into integer codes and one string pool, and save them.
+    Raises TypeError if the table cannot be stored this way (non-string values, NUL in strings).
+    Old snapshots of the same CSV are removed.
+    """
+    path = snapshot_path(fullpath)
+    dirname, basename = os.path.split(path)
+
+    strings = {}
+    codes = np.empty((df.shape[1], df.shape[0]), dtype=np.int32)
+    for j, col in enumerate(df.columns):
+        for i, value in enumerate(df[col].to_list()):
+            if pd.isna(value):
+                codes[j, i] = -1
+            elif isinstance(value, str) and POOL_SEP not in value:
+                codes[j, i] = strings.setdefault(value, len(strings))
+            else:
+                raise TypeError(f"Cannot store {value!r} of column '{col}' in a snapshot.")
+    if any(not isinstance(col, str) or POOL_SEP in col for col in df.columns):
+        raise TypeError("Column names must be strings.")
+    codes[codes == -1] = len(strings) # NaN goes after the last string
+    pool = POOL_SEP.join([*df.columns, *strings]).encode('utf-8')
+
+    os.makedirs(dirname, exist_ok=True)
+    # Write to a temporary file first, so concurrent readers never see a partial snapshot
+    fd, tmp_path = tempfile.mkstemp(dir=dirname, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.lib.format.write_array(f, codes, allow_pickle=False)
+            np.lib.format.write_array(f, np.frombuffer(pool, dtype=np.uint8), allow_pickle=False)
+        # mkstemp creates the file as 0600; make it readable by other users (e.g. cron jobs)
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_path, 0o666 & ~umask)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+    stem = basename.rsplit('.', 2)[0]
+    for name in os.listdir(dirname):
+        if name != basename and name.endswith('.npy') and name.rsplit('.', 2)[0] == stem:
+            try:
+                os.remove(os.path.join(dirname, name))
+            except OSError:
+                pass
+
+#==============================================================================|
+def snapshot_to_frame(codes: np.ndarray, pool: np.ndarray) -> pd.DataFrame:
+    """
+    Build a DataFrame from a snapshot. Only the unique strings are decoded;
+    each column is a take from them by the memory-mapped codes.
+    """
+    ncols = codes.shape[0]
+    strings = pool.tobytes().decode('utf-8').split(POOL_SEP)
+    columns = strings[:ncols]
+    values = np.array(strings[ncols:] + [np.nan], dtype=object)
+    return pd.DataFrame({col: values.take(codes[j]) for j, col in enumerate(columns)})
@@ -0,0 +1,152 @@
+"""
+Library API for historical observation data.
+- Days are fetched lazily, from the end date back to the start date
+- Nothing is printed or exported; errors are raised as `RequestError`
+
+Example:
+    index = SpeciesIndex(read_species_table(SPECIES_TABLE))
+    for date0, date1, merged_df in aggregate(iter_observations('L164543', start, end, api_key), index):
+        ...
+"""
+import asyncio
+from datetime import datetime, timedelta
+import requests
+import pandas as pd
+
+from modules.species_index import SpeciesIndex, SpeciesCounts
+from constants import *
+
+#==============================================================================|
+class RequestError(Exception):
+    """
+    GET request failed.
+    """
+    def __init__(self, url: str, status_code: int):
+        super().__init__(f"GET request failed.\nURL: {url}\nStatus code: {status_code}")
+        self.url = url
+        self.status_code = status_code
+
+#==============================================================================|
+def fetch_day(session: requests.Session, region_code: str, date: datetime, headers: dict) -> list:
+    """
+    Download the observations of one day. Returns a list of records (may be empty).
+    """
+    url_full = URL_DICT['obs'].format(region_code=region_code,
+                                      y=date.year, m=date.month, d=date.day)
+    response = session.get(url_full, headers=headers)
+    if response.status_code != 200:
+        raise RequestError(url_full, response.status_code)
+    return response.json()
+
+#==============================================================================|
+def _days(start_date: datetime, end_date: datetime):
+    if start_date > end_date:
+        start_date, end_date = end_date, start_date
+    current_date = end_date
+    while current_date >= start_date:
+        yield current_date
+        current_date -= timedelta(days=1)
+
+#==============================================================================|
+def iter_observations(region_code: str, start_date: datetime, end_date: datetime,
+                      api_key: str, session: requests.Session = None):
+    """
+    Yield (date, records) for each day, from end_date back to start_date.
+    The next day is only downloaded when the consumer asks for it.
+    """
+    headers = {'X-eBirdApiToken': api_key}
+    session = session or requests.Session()
+    for date in _days(start_date, end_date):
+        yield date, fetch_day(session, region_code, date, headers)
+
+#==============================================================================|
+async def aiter_observations(region_code: str, start_date: datetime, end_date: datetime,
+                             api_key: str, session: requests.Session = None):
+    """
+    Async version of `iter_observations`. Each request runs in the default executor.
+    """
+    headers = {'X-eBirdApiToken': api_key}
+    session = session or requests.Session()
+    loop = asyncio.get_running_loop()
+    for date in _days(start_date, end_date):
+        data = await loop.run_in_executor(None, fetch_day, session, region_code, date, headers)
+        yield date, data
+
+#==============================================================================|
+class _MonthAggregator:
+    """
+    Shared state of `aggregate` and `aaggregate`.
+    """
+    def __init__(self, species_index: SpeciesIndex, on_appended=None):
+        self.species_index = species_index
+        self.on_appended = on_appended
+        self.species_counts = None
+        self.first_date = None # Earliest date added to the current month
+        self.last_date = None  # Latest date added to the current month
+        self.previous_date = None
+
+    def add(self, date: datetime, data: list) -> list:
+        """
+        Add one day. Returns the months (date0, date1, merged_df) finished by it:
+        - the current month, if this day belongs to another one (gaps in the days)
+        - this day's month, if it is the first day of the month, i.e. the last day
+          to come in descending order; so a month is returned without fetching the next one
+        Raises ValueError if the day is not older than the previous one.
+        """
+        if self.previous_date is not None and date >= self.previous_date:
+            raise ValueError(f"Days must be in descending order: {date.strftime('%Y-%m-%d')} "
+                             f"after {self.previous_date.strftime('%Y-%m-%d')}.")
+        self.previous_date = date
+        finished = []
+        if self.last_date is not None and (date.year, date.month) != (self.last_date.year, self.last_date.month):
+            finished.append(self.flush())
+        if self.last_date is None:
+            self.species_counts = SpeciesCounts(self.species_index)
+            self.last_date = date
+        self.first_date = date
+        if data:
+            appended = self.species_counts.add(pd.DataFrame(data))
+            if appended and self.on_appended:
+                self.on_appended(appended)
+        if date.day == 1:
+            finished.append(self.flush())
+        return finished
+
+    def flush(self):
+        if self.last_date is None:
+            return None
+        month = (self.first_date, self.last_date, self.species_counts.frame())
+        self.species_counts = None
+        self.first_date = None
+        self.last_date = None
+        return month
+
+#==============================================================================|
+def aggregate(days, species_index: SpeciesIndex, on_appended=None):
+    """
+    Aggregate (date, records) pairs into monthly counts.
+    Yield (earliest date, latest date fetched in the month, merged_df) as each month completes;
+    the dates only cover the days actually added, e.g. from start_date in the oldest month.
+    Days must be in descending order, as produced by `iter_observations`; raises ValueError otherwise.
+    `on_appended` is called with the codes of species not in the species table.
+    """
+    aggregator = _MonthAggregator(species_index, on_appended)
+    for date, data in days:
+        for month in aggregator.add(date, data):
+            yield month
+    month = aggregator.flush()
+    if month is not None:
+        yield month
+
+#==============================================================================|
+async def aaggregate(days, species_index: SpeciesIndex, on_appended=None):
+    """
+    Async version of `aggregate`, consuming an async iterable such as `aiter_observations`.
+    """
+    aggregator = _MonthAggregator(species_index, on_appended)
+    async for date, data in days:
+        for month in aggregator.add(date, data):
+            yield month
+    month = aggregator.flush()
+    if month is not None:
+        yield month
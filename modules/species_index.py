@@ -0,0 +1,144 @@
+"""
+Join index of the species table on 'speciesCode'
+"""
+import threading
+import numpy as np
+import pandas as pd
+
+from constants import *
+
+#==============================================================================|
+class SpeciesIndex:
+    """
+    Index that maps each speciesCode to a slot.
+    - The species-table part is fixed: rows sharing a speciesCode share a slot; rows without one get slot -1
+    - Unknown species are appended as new slots when `lookup` first sees them,
+      and stay in the index for every later period and consumer
+    - Can be shared between threads: growing the index is locked.
+      `SpeciesCounts` and `CountMatrix` are not; use one per thread
+    """
+    def __init__(self, species_df: pd.DataFrame):
+        self._table = species_df.reset_index(drop=True).copy()
+        self._slots = {}
+        row_slots = []
+        for code in self._table[CODE_EBIRD]:
+            if pd.isna(code):
+                row_slots.append(-1)
+            else:
+                row_slots.append(self._slots.setdefault(code, len(self._slots)))
+        self._row_slots = np.array(row_slots, dtype=np.int64)
+        self._row_slots.setflags(write=False)
+        self._n_table_slots = len(self._slots)
+        self._appended = [] # Rows (OBS_COLS) of the appended slots, in slot order
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    @property
+    def table(self) -> pd.DataFrame:
+        return self._table
+
+    @property
+    def row_slots(self) -> np.ndarray:
+        return self._row_slots
+
+    @property
+    def n_table_slots(self) -> int:
+        return self._n_table_slots
+
+    def codes(self) -> list:
+        with self._lock:
+            return list(self._slots.keys())
+
+    def lookup(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Return the slot of each row in df, growing the index for unknown species.
+        """
+        slots = np.empty(df.shape[0], dtype=np.int64)
+        for i, code in enumerate(df[CODE_EBIRD].to_list()):
+            slot = self._slots.get(code)
+            if slot is None:
+                with self._lock:
+                    # Check again: another thread may have added it
+                    slot = self._slots.get(code)
+                    if slot is None:
+                        self._appended.append({col: df[col].iat[i] for col in OBS_COLS if col in df.columns})
+                        slot = self._slots[code] = len(self._slots)
+            slots[i] = slot
+        return slots
+
+    def appended_frame(self, slots) -> pd.DataFrame:
+        """
+        Rows of the given appended slots, with the columns from the observation data.
+        """
+        with self._lock:
+            rows = [self._appended[slot - self._n_table_slots] for slot in slots]
+        return pd.DataFrame(rows, columns=OBS_COLS)
+
+    def slot_frame(self, columns: list) -> pd.DataFrame:
+        """
+        One row per slot: the first table row of the slot, or the observation fields of an appended slot.
+        """
+        keep = (self._row_slots >= 0) & ~pd.Series(self._row_slots).duplicated().to_numpy()
+        table_rows = self._table.loc[keep].reindex(columns=columns)
+        appended_rows = self.appended_frame(range(self._n_table_slots, len(self))).reindex(columns=columns)
+        return pd.concat([table_rows, appended_rows], ignore_index=True)
+
+#==============================================================================|
+class SpeciesCounts:
+    """
+    Counts of one period, scattered into a preallocated array by slot.
+    """
+    def __init__(self, index: SpeciesIndex):
+        self.index = index
+        self.counts = np.zeros(len(index), dtype=np.int64)
+        self.seen = np.zeros(len(index), dtype=bool)
+        self.extras = {extra_col: {} for extra_col in EXTRA_COLS} # slot -> set of values
+
+    def _grow(self):
+        n = len(self.index) - self.counts.size
+        if n > 0:
+            self.counts = np.concatenate([self.counts, np.zeros(max(n, self.counts.size // 2), dtype=np.int64)])
+            self.seen = np.concatenate([self.seen, np.zeros(self.counts.size - self.seen.size, dtype=bool)])
+
+    def add(self, df: pd.DataFrame) -> list:
+        """
+        Add the counts of one day. Returns the appended species first seen in this period.
+        'X' and any other non-numeric values are counted as 0.
+        """
+        slots = self.index.lookup(df)
+        self._grow()
+        if COUNT_COL in df.columns:
+            values = pd.to_numeric(df[COUNT_COL], errors='coerce').fillna(0).astype('int64').to_numpy()
+            np.add.at(self.counts, slots, values)
+        #-- Extra columns -----------------------------------------------------|
+        for extra_col, values_dict in self.extras.items():
+            if extra_col in df.columns:
+                for slot, value in zip(slots, df[extra_col].to_list()):
+                    if not pd.isna(value):
+                        values_dict.setdefault(slot, set()).add(value)
+        #-- Appended species --------------------------------------------------|
+        new_mask = (slots >= self.index.n_table_slots) & ~self.seen[slots]
+        self.seen[slots] = True
+        return list(dict.fromkeys(df[CODE_EBIRD].to_numpy()[new_mask]))
+
+    def frame(self) -> pd.DataFrame:
+        """
+        The species table with a count column, followed by the appended species seen in this period.
+        """
+        n_table_slots = self.index.n_table_slots
+        row_slots = self.index.row_slots
+        appended_slots = np.flatnonzero(self.seen[n_table_slots:len(self.index)]) + n_table_slots
+
+        merged_df = pd.concat([self.index.table, self.index.appended_frame(appended_slots)],
+                              ignore_index=True)
+        slots = np.concatenate([row_slots, appended_slots])
+        merged_df[EXPORT_COUNT_COL] = np.where(slots >= 0, self.counts[np.maximum(slots, 0)], 0)
+
+        #-- Extra columns -----------------------------------------------------|
+        # Append all the non-null different values into one column
+        for extra_col, values_dict in self.extras.items():
+            merged_df[extra_col] = [' '.join(values_dict.get(slot, ())) for slot in slots]
+
+        return merged_df[EXPORT_OBS_COLS].rename(columns=OBS_COLUMN_DICT)